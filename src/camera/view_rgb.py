@@ -1,24 +1,52 @@
 import depthai as dai
 import cv2
-import os
+import numpy as np
+import argparse
+import atexit
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
-def main():
+# Output directories, created once at import instead of on every capture
+IMG_DIR = Path('data/images')
+VIDEO_DIR = Path('data/videos')
+IMG_DIR.mkdir(parents=True, exist_ok=True)
+VIDEO_DIR.mkdir(parents=True, exist_ok=True)
+
+# Background workers for JPEG encoding/disk writes so captures don't stall the display loop
+_io_pool = ThreadPoolExecutor(max_workers=2)
+atexit.register(_io_pool.shutdown, wait=True)
+
+# H.264 NAL unit types that start a decodable GOP
+NAL_TYPE_IDR = 5
+NAL_TYPE_SPS = 7
+
+# Number of most recent frame latencies kept for the --latency statistics
+LATENCY_WINDOW = 10_000
+
+def main(record=False, capture=False, preview_size=(640, 480), measure_latency=False):
     """
     Main execution function.
     Creates the pipeline, starts the device and displays RGB frames.
-    Also captures images when the 'c' key is pressed and records video when 'r' is pressed.
+    If capture is enabled, captures images when the 'c' key is pressed.
+    If record is enabled, records video when the 'r' key is pressed.
+    If measure_latency is enabled, prints device-to-host frame latency statistics on exit.
     """
 
     # ----------------------------
     # Create DepthAI pipeline
     # ----------------------------
     pipeline = dai.Pipeline()
+    # Disable XLink chunking to reduce per-frame transfer latency
+    pipeline.setXLinkChunkSize(0)
 
     # RGB camera node
     cam_rgb = pipeline.create(dai.node.ColorCamera)
-    cam_rgb.setPreviewSize(640, 480)
-    cam_rgb.setInterleaved(False)
+    preview_width, preview_height = preview_size
+    cam_rgb.setPreviewSize(preview_width, preview_height)
+    # Interleaved (HWC) BGR so frames can be viewed on the host without conversion
+    cam_rgb.setInterleaved(True)
     cam_rgb.setColorOrder(dai.ColorCameraProperties.ColorOrder.BGR)
 
     # Output link
@@ -27,80 +55,165 @@ def main():
 
     cam_rgb.preview.link(xout_rgb.input)
 
+    # On-device H.264 encoder for recording (no host-side re-encoding)
+    if record:
+        enc = pipeline.create(dai.node.VideoEncoder)
+        enc.setDefaultProfilePreset(30, dai.VideoEncoderProperties.Profile.H264_MAIN)
+        cam_rgb.video.link(enc.input)
+
+        xout_h264 = pipeline.create(dai.node.XLinkOut)
+        xout_h264.setStreamName("h264")
+        enc.bitstream.link(xout_h264.input)
+
     # ----------------------------
     # Start the device
     # ----------------------------
     with dai.Device(pipeline) as device:
+        # Keep only the newest frame so the display never lags behind the camera
         rgb_queue = device.getOutputQueue(
             name="rgb",
-            maxSize=4,
+            maxSize=1,
             blocking=False
         )
-
-        print("OAK-D RGB stream started. Press 'q' to quit, 'c' to capture image, 'r' to record video.")
-
-        # Initialize video writer (for recording video)
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')  # Codec for .avi format
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # Ensure the 'data/videos' directory exists
-        if not os.path.exists('data/videos'):
-            os.makedirs('data/videos')
-
-        video_filename = f"data/videos/{timestamp}_video.avi"  # Video filename with timestamp
-        out = None  # Start with no video writer
+        # Encoded packets are drained every iteration and only kept while recording.
+        # Blocking: never silently drop NAL units from a recording if the UI loop stalls
+        h264_queue = None
+        if record:
+            h264_queue = device.getOutputQueue(
+                name="h264",
+                maxSize=30,
+                blocking=True
+            )
+
+        keys = ["'q' to quit"]
+        if capture:
+            keys.append("'c' to capture image")
+        if record:
+            keys.append("'r' to record video")
+        print(f"OAK-D RGB stream started. Press {', '.join(keys)}.")
+
+        video_filename = None
+        out = None  # Start with no open video file
+        got_keyframe = False  # Recording only starts writing at the first SPS/IDR
+        frame_idx = 0
+
+        # Preallocated ring buffer of latencies (ms), no per-frame reallocation
+        latencies = np.empty(LATENCY_WINDOW, np.float32)
+        latency_count = 0
 
         # ----------------------------
         # Main loop
         # ----------------------------
         while True:
             in_rgb = rgb_queue.get()
-            frame = in_rgb.getCvFrame()
 
-            cv2.imshow("OAK-D RGB", frame)
+            if measure_latency:
+                latency = (dai.Clock.now() - in_rgb.getTimestamp()).total_seconds() * 1000
+                latencies[latency_count % LATENCY_WINDOW] = latency
+                latency_count += 1
+
+            # Zero-copy view over the frame data; in_rgb stays referenced for the whole iteration
+            frame = np.frombuffer(in_rgb.getData(), dtype=np.uint8).reshape((preview_height, preview_width, 3))
+
+            # While recording, only refresh the preview every few frames so the
+            # GUI round trip doesn't slow down writing the bitstream
+            preview_every = 1 if out is None else 3
+            if frame_idx % preview_every == 0:
+                cv2.imshow("OAK-D RGB", frame)
+            frame_idx += 1
 
             key = cv2.waitKey(1) & 0xFF
 
             if key == ord('q'):
                 break
-            if key == ord('c'):  # Press 'c' to capture image
+            if capture and key == ord('c'):  # Press 'c' to capture image
                 capture_image(frame)
-            if key == ord('r'):  # Press 'r' to start/stop recording video
+            if record and key == ord('r'):  # Press 'r' to start/stop recording video
                 if out is None:  # If not recording, start recording
-                    out = cv2.VideoWriter(video_filename, fourcc, 30.0, (640, 480))
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    video_filename = VIDEO_DIR / f"{timestamp}_video.h264"  # Raw H.264 bitstream with timestamp
+                    out = open(video_filename, 'wb')
+                    got_keyframe = False
                     print(f"Recording started: {video_filename}")
                 else:  # If recording, stop recording
-                    out.release()
+                    out.close()
                     print(f"Video saved as {video_filename}")
-                    out = None  # Reset video writer
-
-            # If recording, write the current frame to the video file
-            if out is not None:
-                out.write(frame)
-
-        # Release the video writer object when done
+                    print(f"Convert with: ffmpeg -framerate 30 -i {video_filename} -c copy video.mp4")
+                    out = None  # Reset video file
+
+            # Drain encoded packets; if recording, append them to the video file
+            # starting at the first keyframe so the file is decodable from the start
+            if h264_queue is not None:
+                for pkt in h264_queue.tryGetAll():
+                    if out is None:
+                        continue
+                    data = pkt.getData()
+                    if not got_keyframe:
+                        got_keyframe = starts_keyframe(data)
+                    if got_keyframe:
+                        out.write(data)
+
+        # Close the video file when done
         if out is not None:
-            out.release()
+            out.close()
+            print(f"Video saved as {video_filename}")
+
+        if measure_latency and latency_count:
+            valid = latencies[:min(latency_count, LATENCY_WINDOW)]
+            print(f"Latency over last {valid.size} frames: avg {valid.mean():.2f} ms, std {valid.std():.2f} ms")
 
     cv2.destroyAllWindows()
 
 
+def starts_keyframe(data):
+    """
+    Function to check if an H.264 packet starts a GOP (first NAL is SPS or IDR).
+    """
+    i = 3 if data[2] == 1 else 4  # 00 00 01 or 00 00 00 01 start code
+    return len(data) > i and (data[i] & 0x1F) in (NAL_TYPE_IDR, NAL_TYPE_SPS)
+
+
 def capture_image(frame):
     """
     Function to capture and save an image with a timestamp.
     """
-    # Create the images directory if it doesn't exist
-    if not os.path.exists('data/images'):
-        os.makedirs('data/images')
+    # Generate a filename based on the current timestamp (ns, so rapid captures don't collide)
+    filename = IMG_DIR / f"{time.time_ns()}.jpg"
+
+    # Save a copy of the frame in the background (decoupled from the DepthAI buffer)
+    future = _io_pool.submit(cv2.imwrite, str(filename), frame.copy(), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    future.add_done_callback(lambda f: report_saved_image(f, filename))
 
-    # Generate a filename based on the current timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"data/images/{timestamp}.jpg"
 
-    # Save the frame as an image
-    cv2.imwrite(filename, frame)
-    print(f"Image captured and saved as {filename}")
+def report_saved_image(future, filename):
+    """
+    Function to report the result of a background image write.
+    """
+    try:
+        saved = future.result()
+    except Exception as e:
+        print(f"ERROR: Failed to save image {filename}: {e}")
+        return
+    if saved:
+        print(f"Image captured and saved as {filename}")
+    else:
+        print(f"ERROR: Failed to save image {filename}")
+
+
+def parse_args():
+    """
+    Function to parse the command line options.
+    """
+    parser = argparse.ArgumentParser(description="OAK-D RGB preview with optional capture/recording")
+    parser.add_argument("--record", action="store_true", help="Enable video recording with the 'r' key")
+    parser.add_argument("--capture", action="store_true", help="Enable image capture with the 'c' key")
+    parser.add_argument("--preview-size", type=int, nargs=2, default=(640, 480), metavar=("WIDTH", "HEIGHT"),
+                        help="Preview resolution (default: 640 480)")
+    parser.add_argument("--latency", action="store_true", help="Print frame latency statistics on exit")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(record=args.record, capture=args.capture, preview_size=tuple(args.preview_size),
+         measure_latency=args.latency)
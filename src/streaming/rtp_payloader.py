@@ -0,0 +1,122 @@
+"""
+Minimal RTP/H.264 payloader (RFC 6184) for a single UDP receiver.
+
+What it does:
+- Splits an H.264 Annex-B access unit (as produced by the OAK VideoEncoder) into NAL units
+- Sends small NALs as single-NAL RTP packets, fragments large ones into FU-A units
+- Builds the 12-byte RTP header per packet and hands header + payload to the kernel
+  with one vectored sendmsg(), so they are never concatenated in Python
+
+Why this approach:
+- No GStreamer subprocess or bindings needed for the simple point-to-point case
+- NAL payloads are sent as memoryview slices of the encoder packet (no copies in Python)
+
+Used by stream_rtp_h264.py --transport udp. The receiver pipeline is the same as for GStreamer.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import socket
+import struct
+
+# RTP version 2, no padding, no extension, no CSRC
+RTP_VERSION_BYTE = 0x80
+RTP_HEADER = struct.Struct("!BBHII")
+RTP_CLOCK_RATE = 90000
+
+NAL_TYPE_FU_A = 28
+
+START_CODE = re.compile(b"\x00\x00\x01")
+
+
+def split_nal_units(data) -> list[memoryview]:
+    """
+    Split an Annex-B byte stream on 00 00 01 / 00 00 00 01 start codes.
+    Returns memoryview slices of data (start codes stripped).
+    """
+    view = memoryview(data).cast("B")
+    nals = []
+    start = None
+    for match in START_CODE.finditer(view):
+        if start is not None:
+            end = match.start()
+            # 4-byte start code: the extra leading zero belongs to the start code
+            if end > start and view[end - 1] == 0:
+                end -= 1
+            if end > start:
+                nals.append(view[start:end])
+        start = match.end()
+    if start is not None and start < len(view):
+        nals.append(view[start:])
+    return nals
+
+
+class RtpH264Sender:
+    """
+    Packetizes H.264 access units into RTP and sends them over a connected UDP socket.
+    """
+
+    def __init__(self, host: str, port: int, payload_type: int = 96, mtu: int = 1200,
+                 send_buffer: int | None = None) -> None:
+        self.payload_type = payload_type
+        # mtu is the full RTP packet size; the payload gets what's left after the header
+        self.max_payload = mtu - RTP_HEADER.size
+        self.seq = random.getrandbits(16)
+        self.ssrc = random.getrandbits(32)
+        self.dropped = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if send_buffer:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+        self.sock.connect((host, port))
+
+    def send_access_unit(self, data, timestamp: int) -> None:
+        """
+        Send all NAL units of one access unit with the given 90 kHz RTP timestamp.
+        The marker bit is set on the last packet of the access unit.
+        """
+        nals = split_nal_units(data)
+        for i, nal in enumerate(nals):
+            last = i == len(nals) - 1
+            if len(nal) <= self.max_payload:
+                self._send(nal, timestamp, marker=last)
+            else:
+                self._send_fu_a(nal, timestamp, marker=last)
+
+    def _send_fu_a(self, nal: memoryview, timestamp: int, marker: bool) -> None:
+        header = nal[0]
+        fu_indicator = (header & 0xE0) | NAL_TYPE_FU_A
+        nal_type = header & 0x1F
+        chunk = self.max_payload - 2  # FU indicator + FU header
+        offset = 1  # the NAL header is carried in the FU indicator/header
+        while offset < len(nal):
+            end = min(offset + chunk, len(nal))
+            start_bit = 0x80 if offset == 1 else 0
+            end_bit = 0x40 if end == len(nal) else 0
+            fu_header = start_bit | end_bit | nal_type
+            self._send(nal[offset:end], timestamp, marker=marker and bool(end_bit),
+                       prefix=bytes((fu_indicator, fu_header)))
+            offset = end
+
+    def _send(self, payload: memoryview, timestamp: int, marker: bool, prefix: bytes = b"") -> None:
+        rtp_header = RTP_HEADER.pack(
+            RTP_VERSION_BYTE,
+            (0x80 if marker else 0) | self.payload_type,
+            self.seq,
+            timestamp & 0xFFFFFFFF,
+            self.ssrc,
+        )
+        self.seq = (self.seq + 1) & 0xFFFF
+        buffers = [rtp_header, prefix, payload] if prefix else [rtp_header, payload]
+        try:
+            self.sock.sendmsg(buffers, [], socket.MSG_DONTWAIT)
+        except OSError:
+            # Send buffer full (EAGAIN/ENOBUFS), receiver not listening (ECONNREFUSED) or
+            # link/route lost (ENETUNREACH/EHOSTUNREACH): drop like a lossy link would,
+            # as udpsink does, rather than stall or kill the stream
+            self.dropped += 1
+
+    def close(self) -> None:
+        self.sock.close()
@@ -5,6 +5,10 @@ What it does:
 - Uses OAK-D / OAK-D Pro internal H.264 encoder (DepthAI VideoEncoder)
 - Launches a GStreamer pipeline that takes H.264 bytestream from stdin (fdsrc)
   -> h264parse -> rtph264pay -> udpsink (RTP over UDP)
+- Or, with --transport appsrc, runs the same pipeline in-process (appsrc) and
+  pushes the encoder packets into it, with no subprocess and no kernel pipe
+- Or, with --transport udp, packetizes RTP in Python (rtp_payloader.py) and sends
+  straight to a UDP socket, without GStreamer on the Pi at all
 - Sends RTP stream to a PC (QGroundControl or any RTP receiver)
 
 Why this approach:
@@ -14,6 +18,9 @@ Why this approach:
 Requirements on Raspberry Pi:
 - depthai, opencv-python (optional preview)
 - GStreamer: gstreamer1.0-tools + plugins including h264parse, rtph264pay
+- For --transport appsrc: PyGObject with GStreamer introspection (python3-gi, gir1.2-gst-plugins-base-1.0)
+- Optional: run with CAP_SYS_NICE (or sudo) and add isolcpus=2 to /boot/cmdline.txt so
+  the streaming process gets CPU2 to itself with SCHED_FIFO priority (see --cpu)
 
 Test receiver on PC (GStreamer):
 gst-launch-1.0 -v udpsrc port=5004 caps="application/x-rtp,media=video,encoding-name=H264,payload=96" ! rtph264depay ! avdec_h264 ! videoconvert ! autovideosink sync=false
@@ -26,10 +33,30 @@ import os
 import signal
 import subprocess
 import sys
+from fractions import Fraction
 from pathlib import Path
+from shutil import which
 
 import depthai as dai
 
+from rtp_payloader import RTP_CLOCK_RATE, RtpH264Sender
+
+
+# Kernel caps SO_SNDBUF at net.core.wmem_max; raise it on the Pi with:
+#   sudo sysctl -w net.core.wmem_max=4194304
+UDP_SEND_BUFFER_BYTES = 2 * 1024 * 1024
+
+# THE_1080_P sensor output the ISP scales from
+SENSOR_WIDTH = 1920
+SENSOR_HEIGHT = 1080
+
+# Hardware ISP scaler limits on the reduced scale fraction
+ISP_SCALE_MAX_NUMERATOR = 16
+ISP_SCALE_MAX_DENOMINATOR = 63
+
+# RTP packet size, kept below Wi-Fi/VPN fragmentation limits
+RTP_MTU = 1200
+
 
 def project_root() -> Path:
     # .../src/streaming/stream_rtp_h264.py -> repo root is 3 levels up
@@ -38,10 +65,20 @@ def project_root() -> Path:
 
 def build_pipeline(width: int, height: int, fps: int, bitrate_kbps: int) -> dai.Pipeline:
     pipeline = dai.Pipeline()
+    # Disable XLink chunking to reduce per-packet transfer latency
+    pipeline.setXLinkChunkSize(0)
 
     cam = pipeline.create(dai.node.ColorCamera)
     cam.setResolution(dai.ColorCameraProperties.SensorResolution.THE_1080_P)
-    cam.setVideoSize(width, height)
+    scale = Fraction(width, SENSOR_WIDTH)
+    if (scale == Fraction(height, SENSOR_HEIGHT) and scale <= 1
+            and scale.numerator <= ISP_SCALE_MAX_NUMERATOR
+            and scale.denominator <= ISP_SCALE_MAX_DENOMINATOR):
+        # Same aspect ratio: let the ISP downscale (e.g. 2/3 for 720p), video size follows ISP output
+        cam.setIspScale(scale.numerator, scale.denominator)
+    else:
+        # Different aspect ratio, or a fraction the ISP can't do: center-crop from the full 1080p ISP output
+        cam.setVideoSize(width, height)
     cam.setFps(fps)
     cam.setInterleaved(False)
     cam.setColorOrder(dai.ColorCameraProperties.ColorOrder.BGR)
@@ -50,9 +87,14 @@ def build_pipeline(width: int, height: int, fps: int, bitrate_kbps: int) -> dai.
     enc = pipeline.create(dai.node.VideoEncoder)
     enc.setDefaultProfilePreset(
         fps,
-        dai.VideoEncoderProperties.Profile.H264_MAIN
+        dai.VideoEncoderProperties.Profile.H264_HIGH
     )
+    # Low-delay IPPP: no B-frame reordering, constant bitrate for the radio link
+    enc.setNumBFrames(0)
+    enc.setRateControlMode(dai.VideoEncoderProperties.RateControlMode.CBR)
     enc.setBitrateKbps(bitrate_kbps)
+    # Extra output frames so the encoder absorbs brief stalls on the host side
+    enc.setNumFramesPool(8)
     # Send SPS/PPS periodically so receivers can join mid-stream
     enc.setKeyframeFrequency(fps)  # ~1 keyframe/sec
 
@@ -65,6 +107,21 @@ def build_pipeline(width: int, height: int, fps: int, bitrate_kbps: int) -> dai.
     return pipeline
 
 
+def rtp_sink_elements(host: str, port: int, payload_type: int) -> list[str]:
+    """
+    Shared GStreamer tail: h264parse -> rtph264pay -> udpsink host=... port=...
+    """
+    return [
+        # SPS/PPS re-sent every second here only, so the payloader doesn't insert them a second time
+        "h264parse", "config-interval=1",
+        # zero-latency: send each slice right away, only holding SPS/PPS to bundle with the next slice
+        "!", "rtph264pay", f"pt={payload_type}", "aggregate-mode=zero-latency", f"mtu={RTP_MTU}",
+        # 2 MiB kernel send buffer (SO_SNDBUF) so IDR bursts aren't dropped; no QoS drops of late buffers
+        "!", "udpsink", f"host={host}", f"port={port}", "sync=false", "async=false",
+        "qos=false", f"buffer-size={UDP_SEND_BUFFER_BYTES}",
+    ]
+
+
 def launch_gstreamer_rtp(host: str, port: int, payload_type: int) -> subprocess.Popen:
     """
     GStreamer pipeline:
@@ -75,9 +132,7 @@ def launch_gstreamer_rtp(host: str, port: int, payload_type: int) -> subprocess.
         "gst-launch-1.0",
         "-q",
         "fdsrc", "fd=0",
-        "!", "h264parse", "config-interval=1",
-        "!", "rtph264pay", f"pt={payload_type}",
-        "!", "udpsink", f"host={host}", f"port={port}", "sync=false", "async=false",
+        "!", *rtp_sink_elements(host, port, payload_type),
     ]
 
     # stdin=PIPE so we can write H264 bytes into it
@@ -86,10 +141,128 @@ def launch_gstreamer_rtp(host: str, port: int, payload_type: int) -> subprocess.
         stdin=subprocess.PIPE,
         stdout=subprocess.DEVNULL,
         stderr=subprocess.PIPE,  # keep for debugging if it fails
-        bufsize=0,
+        bufsize=0,  # unbuffered: packets go straight to os.writev, no copy into a Python buffer
     )
 
 
+def launch_gstreamer_appsrc(host: str, port: int, payload_type: int):
+    """
+    In-process GStreamer pipeline:
+      appsrc -> h264parse -> rtph264pay -> udpsink host=... port=...
+    Returns (pipeline, appsrc). Requires PyGObject (gi) with GStreamer bindings.
+    Raises RuntimeError if the pipeline can't be built (e.g. a missing plugin).
+    """
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import GLib, Gst
+
+    Gst.init(None)
+    description = " ".join([
+        "appsrc", "name=src", "is-live=true", "do-timestamp=true", "format=time",
+        "caps=video/x-h264,stream-format=byte-stream",
+        "!", *rtp_sink_elements(host, port, payload_type),
+    ])
+    try:
+        gst_pipeline = Gst.parse_launch(description)
+    except GLib.Error as e:
+        raise RuntimeError(e.message) from e
+    appsrc = gst_pipeline.get_by_name("src")
+    gst_pipeline.set_state(Gst.State.PLAYING)
+    return gst_pipeline, appsrc
+
+
+def pin_realtime(cpu: int, priority: int = 20) -> None:
+    """
+    Pin this process to one CPU and switch it to SCHED_FIFO, away from the USB IRQs on CPU0.
+    Best effort: needs Linux and CAP_SYS_NICE, otherwise only a warning is printed.
+    """
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except (AttributeError, OSError) as e:
+        print(f"[WARN] Could not pin to CPU{cpu}: {e}", file=sys.stderr)
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+    except (AttributeError, OSError) as e:
+        print(f"[WARN] Could not enable SCHED_FIFO: {e}", file=sys.stderr)
+
+
+def write_all(fd: int, buffers: list[memoryview]) -> None:
+    """
+    Write all buffers to fd using os.writev, resuming after partial writes.
+    """
+    while buffers:
+        written = os.writev(fd, buffers)
+        while buffers and written >= len(buffers[0]):
+            written -= len(buffers[0])
+            buffers.pop(0)
+        if buffers and written:
+            buffers[0] = buffers[0][written:]
+
+
+def stream_pipe(q: dai.DataOutputQueue, gst: subprocess.Popen, stop: dict) -> int:
+    """
+    Forward H.264 packets from the DepthAI queue into the gst-launch stdin pipe.
+    """
+    gst_fd = gst.stdin.fileno()
+
+    while not stop["flag"]:
+        # Drain everything already queued; block only when nothing is pending
+        pkts = q.tryGetAll()
+        if not pkts:
+            pkts = [q.get()]
+        # Zero-copy views over the packet memory; pkts stays referenced until
+        # the write below returns, so the views never outlive their buffers.
+        views = [memoryview(pkt.getData()) for pkt in pkts]
+        # Write raw H.264 bytes into GStreamer pipeline with a single vectored write
+        try:
+            write_all(gst_fd, views)
+        except BrokenPipeError:
+            err = (gst.stderr.read().decode(errors="ignore") if gst.stderr else "")
+            print("ERROR: GStreamer pipeline terminated (BrokenPipe).", file=sys.stderr)
+            if err:
+                print("GStreamer stderr:\n" + err, file=sys.stderr)
+            return 4
+
+    return 0
+
+
+def stream_appsrc(q: dai.DataOutputQueue, appsrc, stop: dict) -> int:
+    """
+    Push H.264 packets from the DepthAI queue straight into an in-process appsrc.
+    """
+    from gi.repository import Gst
+
+    while not stop["flag"]:
+        pkts = q.tryGetAll()
+        if not pkts:
+            pkts = [q.get()]
+        for pkt in pkts:
+            # One explicit copy into memory owned by the GstBuffer
+            buf = Gst.Buffer.new_wrapped(bytes(pkt.getData()))
+            ret = appsrc.emit("push-buffer", buf)
+            if ret != Gst.FlowReturn.OK:
+                print(f"ERROR: GStreamer appsrc rejected buffer ({ret.value_nick}).", file=sys.stderr)
+                return 4
+
+    return 0
+
+
+def stream_udp(q: dai.DataOutputQueue, sender: RtpH264Sender, stop: dict) -> int:
+    """
+    Packetize H.264 packets from the DepthAI queue as RTP and send them over UDP directly.
+    """
+    while not stop["flag"]:
+        pkts = q.tryGetAll()
+        if not pkts:
+            pkts = [q.get()]
+        for pkt in pkts:
+            # 90 kHz RTP clock derived from the device capture timestamp
+            timestamp = int(pkt.getTimestamp().total_seconds() * RTP_CLOCK_RATE)
+            sender.send_access_unit(pkt.getData(), timestamp)
+
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="OAK H.264 RTP streaming via GStreamer")
     parser.add_argument("--host", required=True, help="Destination PC IP (receiver) (e.g. 192.168.1.50)")
@@ -99,19 +272,42 @@ def main() -> int:
     parser.add_argument("--fps", type=int, default=30, help="Frames per second (default: 30)")
     parser.add_argument("--bitrate-kbps", type=int, default=4000, help="H.264 bitrate kbps (default: 4000)")
     parser.add_argument("--payload-type", type=int, default=96, help="RTP payload type (default: 96)")
+    parser.add_argument("--queue-size", type=int, default=60,
+                        help="DepthAI H.264 output queue depth, absorbs IDR bursts (default: 60)")
+    parser.add_argument("--cpu", type=int, default=2,
+                        help="CPU to pin the streaming process to with SCHED_FIFO, -1 to disable (default: 2)")
+    parser.add_argument("--transport", choices=("pipe", "appsrc", "udp"), default="pipe",
+                        help="pipe: gst-launch subprocess fed via stdin; appsrc: in-process GStreamer; "
+                             "udp: built-in RTP payloader, no GStreamer (default: pipe)")
     args = parser.parse_args()
 
     # Safety: make sure gst-launch exists
-    if not shutil_which("gst-launch-1.0"):
+    if args.transport == "pipe" and which("gst-launch-1.0") is None:
         print("ERROR: gst-launch-1.0 not found. Install GStreamer on the Raspberry Pi.", file=sys.stderr)
         return 2
 
     pipeline = build_pipeline(args.width, args.height, args.fps, args.bitrate_kbps)
 
-    gst = launch_gstreamer_rtp(args.host, args.port, args.payload_type)
-    if gst.stdin is None:
-        print("ERROR: Failed to open GStreamer stdin.", file=sys.stderr)
-        return 3
+    gst = None
+    gst_pipeline = None
+    sender = None
+    if args.transport == "pipe":
+        gst = launch_gstreamer_rtp(args.host, args.port, args.payload_type)
+        if gst.stdin is None:
+            print("ERROR: Failed to open GStreamer stdin.", file=sys.stderr)
+            return 3
+    elif args.transport == "udp":
+        sender = RtpH264Sender(args.host, args.port, args.payload_type, mtu=RTP_MTU,
+                               send_buffer=UDP_SEND_BUFFER_BYTES)
+    else:
+        try:
+            gst_pipeline, appsrc = launch_gstreamer_appsrc(args.host, args.port, args.payload_type)
+        except (ImportError, ValueError) as e:
+            print(f"ERROR: GStreamer Python bindings unavailable ({e}). Install python3-gi.", file=sys.stderr)
+            return 2
+        except RuntimeError as e:
+            print(f"ERROR: Failed to build GStreamer pipeline ({e}). Check the GStreamer plugins are installed.", file=sys.stderr)
+            return 3
 
     # Graceful shutdown
     stop = {"flag": False}
@@ -122,49 +318,52 @@ def main() -> int:
     signal.signal(signal.SIGINT, handle_sigint)
     signal.signal(signal.SIGTERM, handle_sigint)
 
+    # Pin after launching gst-launch so the subprocess keeps the default scheduling
+    if args.cpu >= 0:
+        pin_realtime(args.cpu)
+
     try:
         with dai.Device(pipeline) as device:
-            q = device.getOutputQueue(name="h264", maxSize=30, blocking=True)
+            # Blocking queue: never drop NAL units, buffer IDR bursts instead
+            q = device.getOutputQueue(name="h264", maxSize=args.queue_size, blocking=True)
             print(f"[OK] Streaming RTP H.264 to {args.host}:{args.port}  ({args.width}x{args.height}@{args.fps}, {args.bitrate_kbps} kbps)")
             print("[INFO] Ctrl+C to stop.")
 
-            while not stop["flag"]:
-                pkt = q.get()
-                data = pkt.getData()
-                # Write raw H.264 bytes into GStreamer pipeline
-                try:
-                    gst.stdin.write(data)
-                except BrokenPipeError:
-                    err = (gst.stderr.read().decode(errors="ignore") if gst.stderr else "")
-                    print("ERROR: GStreamer pipeline terminated (BrokenPipe).", file=sys.stderr)
-                    if err:
-                        print("GStreamer stderr:\n" + err, file=sys.stderr)
-                    return 4
+            if gst is not None:
+                rc = stream_pipe(q, gst, stop)
+            elif sender is not None:
+                rc = stream_udp(q, sender, stop)
+            else:
+                rc = stream_appsrc(q, appsrc, stop)
+            if rc:
+                return rc
 
     finally:
-        try:
-            if gst.stdin:
-                gst.stdin.close()
-        except Exception:
-            pass
-        try:
-            gst.terminate()
-        except Exception:
-            pass
+        if gst is not None:
+            try:
+                if gst.stdin:
+                    gst.stdin.close()
+            except Exception:
+                pass
+            try:
+                gst.terminate()
+            except Exception:
+                pass
+        if gst_pipeline is not None:
+            from gi.repository import Gst
+            try:
+                appsrc.emit("end-of-stream")
+                gst_pipeline.set_state(Gst.State.NULL)
+            except Exception:
+                pass
+        if sender is not None:
+            if sender.dropped:
+                print(f"[WARN] Dropped {sender.dropped} RTP packets (send buffer full or network/receiver unreachable).", file=sys.stderr)
+            sender.close()
 
     print("[OK] Stopped.")
     return 0
 
 
-def shutil_which(cmd: str) -> str | None:
-    # tiny local replacement to avoid importing shutil if you prefer minimal imports
-    paths = os.environ.get("PATH", "").split(os.pathsep)
-    for p in paths:
-        full = Path(p) / cmd
-        if full.exists() and os.access(full, os.X_OK):
-            return str(full)
-    return None
-
-
 if __name__ == "__main__":
     raise SystemExit(main())